@@ -0,0 +1,113 @@
+"""
+Cold-start benchmark for the backend.
+
+Measures, in fresh interpreters:
+  - import time of backend.main
+  - time from spawning uvicorn to the first successful GET /ready
+
+and fails (exit code 1) when the median exceeds the budget.
+
+Usage (from the repository root):
+    python -m backend.benchmarks.startup --runs 5 --import-budget 1.0 --ready-budget 3.0
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+IMPORT_SNIPPET = (
+    "import time; t = time.perf_counter(); import backend.main; "
+    "print(time.perf_counter() - t)"
+)
+
+
+def _env() -> dict:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(REPO_ROOT), env.get("PYTHONPATH")]))
+    # The client only needs a key to be constructed; no request is made during warm-up
+    env.setdefault("OPENAI_API_KEY", "benchmark")
+    return env
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure_import(workdir: str) -> float:
+    out = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET],
+        cwd=workdir, env=_env(), capture_output=True, text=True, check=True,
+    )
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def measure_first_ready(workdir: str, timeout: float) -> float:
+    """
+    Spawns uvicorn against an empty working directory (fresh SQLite file) and
+    polls /ready until it returns 200.
+    """
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}/ready"
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=workdir, env=_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            if proc.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with code {proc.returncode}")
+            try:
+                with urllib.request.urlopen(url, timeout=1) as resp:
+                    if resp.status == 200:
+                        return time.perf_counter() - started
+            except (urllib.error.URLError, ConnectionError):
+                pass
+            time.sleep(0.01)
+        raise TimeoutError(f"/ready did not succeed within {timeout}s")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--import-budget", type=float, default=1.0, help="seconds, median import time")
+    parser.add_argument("--ready-budget", type=float, default=3.0, help="seconds, median time to first successful /ready")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    args = parser.parse_args(argv)
+
+    import_times, ready_times = [], []
+    for _ in range(args.runs):
+        with tempfile.TemporaryDirectory() as workdir:
+            import_times.append(measure_import(workdir))
+        with tempfile.TemporaryDirectory() as workdir:
+            ready_times.append(measure_first_ready(workdir, args.timeout))
+
+    results = [
+        ("import backend.main", import_times, args.import_budget),
+        ("first successful /ready", ready_times, args.ready_budget),
+    ]
+    over_budget = False
+    for name, times, budget in results:
+        median = statistics.median(times)
+        status = "ok" if median <= budget else "OVER BUDGET"
+        over_budget |= median > budget
+        print(f"{name:<26} median {median:.3f}s  min {min(times):.3f}s  max {max(times):.3f}s  budget {budget:.3f}s  {status}")
+    return 1 if over_budget else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
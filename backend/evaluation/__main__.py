@@ -0,0 +1,92 @@
+"""
+Offline evaluation of tutoring prompts.
+
+Replays recorded transcripts (teacher-forced: every user turn is answered given
+the recorded history before it) or synthetic learner scripts (free-running)
+through stream_llm_response, and reports per prompt version: tokens in/out,
+time-to-first-token, JSON-validity rate and illegal currentWordProgress transitions.
+
+Usage (from the repository root):
+    python -m backend.evaluation --from-db --limit 50
+    python -m backend.evaluation --conversations scripts.jsonl \\
+        --prompt current=backend.services.openai_service:get_system_prompt \\
+        --prompt short=my_prompts:short_prompt --concurrency 16 --output report.json
+
+A prompt is any callable taking the user_info dict and returning the system prompt.
+--provider names a zero-argument factory returning an AsyncOpenAI-compatible
+client; --base-url points the default client at any OpenAI-compatible server.
+"""
+import argparse
+import asyncio
+import importlib
+import os
+import sys
+from typing import Any, Callable
+from ..services.openai_service import DEFAULT_MODEL
+from .runner import (
+    format_report, load_conversations, load_db_conversations,
+    run_evaluation, summarize, to_json,
+)
+
+DEFAULT_PROMPT = "current=backend.services.openai_service:get_system_prompt"
+
+
+def import_object(spec: str) -> Callable:
+    module_name, _, attr = spec.partition(":")
+    if not attr:
+        raise argparse.ArgumentTypeError(f"expected module:attribute, got '{spec}'")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+def build_client(args) -> Any:
+    if args.provider:
+        return import_object(args.provider)()
+    if args.base_url:
+        from openai import AsyncOpenAI
+
+        return AsyncOpenAI(base_url=args.base_url, api_key=os.getenv(args.api_key_env, "unused"))
+    return None  # stream_llm_response falls back to the app's shared client
+
+
+async def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--conversations", help="JSONL of recorded transcripts and/or learner scripts")
+    source.add_argument("--from-db", action="store_true", help="replay recorded sessions from the app database")
+    parser.add_argument("--limit", type=int, help="max sessions to load with --from-db")
+    parser.add_argument("--prompt", action="append", metavar="NAME=MODULE:FUNC",
+                        help=f"prompt version to evaluate (repeatable, default {DEFAULT_PROMPT})")
+    parser.add_argument("--provider", metavar="MODULE:FACTORY")
+    parser.add_argument("--base-url")
+    parser.add_argument("--api-key-env", default="OPENAI_API_KEY")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--output", help="write summary and per-turn results as JSON")
+    args = parser.parse_args(argv)
+
+    prompts = {}
+    for spec in args.prompt or [DEFAULT_PROMPT]:
+        name, _, target = spec.rpartition("=")
+        prompts[name or target] = import_object(target)
+
+    if args.from_db:
+        conversations = await load_db_conversations(args.limit)
+    else:
+        conversations = load_conversations(args.conversations)
+    if not conversations:
+        print("No conversations to evaluate.", file=sys.stderr)
+        return 1
+
+    results = await run_evaluation(
+        conversations, prompts, client=build_client(args), model=args.model, concurrency=args.concurrency
+    )
+    summaries = summarize(results)
+    print(format_report(summaries))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(to_json(summaries, results))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,312 @@
+import asyncio
+import json
+import statistics
+import time
+from dataclasses import dataclass, field, asdict
+from typing import Any, Callable, Dict, List, Optional
+from sqlalchemy.future import select
+from ..models.db import AsyncSessionLocal, User, Session, init_db
+from ..services.openai_service import DEFAULT_MODEL, stream_llm_response
+from .transitions import transition_error
+
+REQUIRED_KEYS = ("response", "currentCategory", "currentWord", "currentWordProgress")
+
+PromptFn = Callable[[dict], str]
+
+
+@dataclass
+class Conversation:
+    """
+    One conversation to replay.
+    With `messages` (a recorded Session.message_history) every user turn is
+    replayed against the recorded history before it. With `script` (a list of
+    learner messages) the conversation runs on the model's own replies.
+    """
+    id: str
+    user_info: Dict[str, str]
+    messages: Optional[List[Dict[str, Any]]] = None
+    script: Optional[List[str]] = None
+
+
+@dataclass
+class TurnResult:
+    prompt_version: str
+    conversation_id: str
+    turn: int
+    tokens_in: Optional[int] = None
+    tokens_out: Optional[int] = None
+    ttft: Optional[float] = None
+    latency: float = 0.0
+    valid_json: bool = False
+    stream_error: Optional[str] = None
+    illegal_transition: Optional[str] = None
+
+
+@dataclass
+class VersionSummary:
+    prompt_version: str
+    conversations: int = 0
+    turns: int = 0
+    tokens_in: int = 0
+    tokens_out: int = 0
+    ttft_p50: Optional[float] = None
+    ttft_p95: Optional[float] = None
+    latency_p50: Optional[float] = None
+    json_valid_rate: float = 0.0
+    stream_errors: int = 0
+    illegal_transitions: int = 0
+    illegal_examples: List[str] = field(default_factory=list)
+
+
+def parse_response(content: str) -> Optional[dict]:
+    """
+    Returns the parsed assistant JSON if it has every required key, else None.
+    """
+    try:
+        data = json.loads(content)
+    except (json.JSONDecodeError, TypeError):
+        return None
+    if not isinstance(data, dict) or any(key not in data for key in REQUIRED_KEYS):
+        return None
+    return data
+
+
+def parse_error_payload(content: str) -> Optional[str]:
+    """
+    stream_llm_response ends with {"error": ..., "detail": ...} when the provider fails.
+    """
+    tail = content[content.rfind('{"error"'):] if '{"error"' in content else ""
+    try:
+        data = json.loads(tail)
+    except json.JSONDecodeError:
+        return None
+    return f"{data.get('error')}: {data.get('detail')}" if isinstance(data, dict) else None
+
+
+def load_conversations(path: str) -> List[Conversation]:
+    """
+    Reads a JSONL file where each line is
+    {"id": ..., "user": {"name", "sourceLanguage", "targetLanguage"}, "messages": [...]}
+    or the same with "script": ["learner message", ...] instead of "messages".
+    """
+    conversations = []
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            conversations.append(Conversation(
+                id=str(row.get("id", line_no)),
+                user_info=row["user"],
+                messages=row.get("messages"),
+                script=row.get("script"),
+            ))
+    return conversations
+
+
+async def load_db_conversations(limit: Optional[int] = None) -> List[Conversation]:
+    """
+    Loads recorded sessions (with at least one user turn) from the app database.
+    """
+    await init_db()
+    async with AsyncSessionLocal() as db:
+        query = select(Session, User).join(User, Session.user_id == User.id).order_by(Session.created_at.desc())
+        if limit:
+            query = query.limit(limit)
+        rows = (await db.execute(query)).all()
+    return [
+        Conversation(
+            id=session_obj.id,
+            user_info={
+                "name": user.user_name,
+                "sourceLanguage": user.source_language,
+                "targetLanguage": user.target_language,
+            },
+            messages=list(session_obj.message_history or []),
+        )
+        for session_obj, user in rows
+        if any(m["role"] == "user" for m in session_obj.message_history or [])
+    ]
+
+
+async def run_turn(
+    history: List[Dict[str, Any]],
+    result: TurnResult,
+    client: Any,
+    model: str
+) -> str:
+    """
+    Streams one completion for `history`, filling in tokens, timings and JSON validity.
+    Returns the raw assistant content.
+    """
+    usage = {}
+
+    def record_usage(prompt_tokens: int, completion_tokens: int):
+        usage["in"], usage["out"] = prompt_tokens, completion_tokens
+
+    buffer = ""
+    started = time.perf_counter()
+    # Only provider-reported usage counts here; estimates would blur prompt comparisons
+    async for chunk in stream_llm_response(
+        history, client=client, model=model, on_usage=record_usage, estimate_usage=False
+    ):
+        if result.ttft is None:
+            result.ttft = time.perf_counter() - started
+        buffer += chunk
+    result.latency = time.perf_counter() - started
+    result.tokens_in, result.tokens_out = usage.get("in"), usage.get("out")
+
+    parsed = parse_response(buffer)
+    result.valid_json = parsed is not None
+    if parsed is None:
+        error = parse_error_payload(buffer)
+        if error:
+            result.stream_error = error
+    return buffer
+
+
+async def run_conversation(
+    conversation: Conversation,
+    prompt_version: str,
+    prompt_fn: PromptFn,
+    client: Any,
+    model: str
+) -> List[TurnResult]:
+    system = {"role": "system", "content": prompt_fn(conversation.user_info)}
+    results = []
+    prev_state = None  # (currentWord, currentWordProgress) before this turn; None = unknown
+    failed_words = set()  # words that reached exerciseFailed, i.e. are on the retry path
+
+    def observe(state):
+        if state[1] == "exerciseFailed":
+            failed_words.add(state[0])
+        return state
+
+    def check(result: TurnResult, content: str):
+        """
+        Flags an illegal move from prev_state to the generated state and returns that state.
+        Doesn't observe it: only states the conversation continues from may mark a retry.
+        """
+        parsed = parse_response(content)
+        if parsed is None:
+            return None
+        state = (parsed["currentWord"], parsed["currentWordProgress"])
+        # The first stage in a conversation may resume any word from the greeting
+        if prev_state is not None:
+            result.illegal_transition = transition_error(
+                *prev_state, *state, retrying=prev_state[0] in failed_words
+            )
+        return state
+
+    if conversation.messages is not None:
+        # Replay each recorded user turn against the recorded history before it.
+        # Generated replies are discarded, so only recorded states mark retries.
+        recorded = [m for m in conversation.messages if m["role"] != "system"]
+        for i, message in enumerate(recorded):
+            if message["role"] == "assistant":
+                parsed = parse_response(message["content"])
+                if parsed is not None:
+                    prev_state = observe((parsed["currentWord"], parsed["currentWordProgress"]))
+                continue
+            result = TurnResult(prompt_version, conversation.id, len(results))
+            content = await run_turn([system] + recorded[:i + 1], result, client, model)
+            check(result, content)
+            results.append(result)
+    else:
+        history = [system]
+        for user_message in conversation.script or []:
+            history.append({"role": "user", "content": user_message})
+            result = TurnResult(prompt_version, conversation.id, len(results))
+            content = await run_turn(history, result, client, model)
+            history.append({"role": "assistant", "content": content})
+            state = check(result, content)
+            if state is not None:
+                prev_state = observe(state)
+            results.append(result)
+    return results
+
+
+async def run_evaluation(
+    conversations: List[Conversation],
+    prompts: Dict[str, PromptFn],
+    client: Any = None,
+    model: str = DEFAULT_MODEL,
+    concurrency: int = 8
+) -> List[TurnResult]:
+    """
+    Replays every conversation under every prompt version, at most `concurrency`
+    conversations at a time. Turns within a conversation run in order.
+    """
+    # stream_llm_response imports openai lazily; keep that out of the first turn's TTFT
+    import openai  # noqa: F401
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(conversation: Conversation, version: str, prompt_fn: PromptFn):
+        async with semaphore:
+            return await run_conversation(conversation, version, prompt_fn, client, model)
+
+    batches = await asyncio.gather(*(
+        bounded(conversation, version, prompt_fn)
+        for version, prompt_fn in prompts.items()
+        for conversation in conversations
+    ))
+    return [result for batch in batches for result in batch]
+
+
+def _percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def summarize(results: List[TurnResult]) -> List[VersionSummary]:
+    by_version: Dict[str, List[TurnResult]] = {}
+    for result in results:
+        by_version.setdefault(result.prompt_version, []).append(result)
+
+    summaries = []
+    for version, turns in by_version.items():
+        ttfts = [t.ttft for t in turns if t.ttft is not None]
+        illegal = [t for t in turns if t.illegal_transition]
+        summaries.append(VersionSummary(
+            prompt_version=version,
+            conversations=len({t.conversation_id for t in turns}),
+            turns=len(turns),
+            tokens_in=sum(t.tokens_in or 0 for t in turns),
+            tokens_out=sum(t.tokens_out or 0 for t in turns),
+            ttft_p50=_percentile(ttfts, 50),
+            ttft_p95=_percentile(ttfts, 95),
+            latency_p50=statistics.median([t.latency for t in turns]) if turns else None,
+            json_valid_rate=sum(t.valid_json for t in turns) / len(turns) if turns else 0.0,
+            stream_errors=sum(1 for t in turns if t.stream_error),
+            illegal_transitions=len(illegal),
+            illegal_examples=[f"{t.conversation_id}#{t.turn}: {t.illegal_transition}" for t in illegal[:5]],
+        ))
+    return summaries
+
+
+def format_report(summaries: List[VersionSummary]) -> str:
+    def seconds(value: Optional[float]) -> str:
+        return "-" if value is None else f"{value:.2f}s"
+
+    lines = [
+        f"{'prompt':<32} {'conv':>5} {'turns':>6} {'tok in':>9} {'tok out':>8} "
+        f"{'ttft p50':>9} {'ttft p95':>9} {'lat p50':>8} {'json ok':>8} {'errors':>7} {'illegal':>8}"
+    ]
+    for s in summaries:
+        lines.append(
+            f"{s.prompt_version:<32} {s.conversations:>5} {s.turns:>6} {s.tokens_in:>9} {s.tokens_out:>8} "
+            f"{seconds(s.ttft_p50):>9} {seconds(s.ttft_p95):>9} {seconds(s.latency_p50):>8} "
+            f"{s.json_valid_rate:>8.1%} {s.stream_errors:>7} {s.illegal_transitions:>8}"
+        )
+        lines.extend(f"    illegal {example}" for example in s.illegal_examples)
+    return "\n".join(lines)
+
+
+def to_json(summaries: List[VersionSummary], results: List[TurnResult]) -> str:
+    return json.dumps({
+        "summary": [asdict(s) for s in summaries],
+        "turns": [asdict(r) for r in results],
+    }, indent=2)
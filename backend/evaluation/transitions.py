@@ -0,0 +1,64 @@
+from typing import Optional
+
+# currentWordProgress values the system prompt allows (None = no word chosen yet)
+PROGRESS_STATES = {
+    None, "initiated", "denied", "scenario", "meaning", "pronunciation",
+    "sentence", "context", "exerciseGenerated", "exerciseFailed", "learned",
+}
+
+# Stages a word may move to from each stage while the word stays the same.
+# Staying in the same stage is always allowed.
+ALLOWED_NEXT = {
+    "initiated": {"scenario", "meaning", "denied"},
+    "scenario": {"meaning", "denied"},
+    "meaning": {"pronunciation", "denied"},
+    "pronunciation": {"sentence"},
+    "sentence": {"context"},
+    "context": {"exerciseGenerated"},
+    "exerciseGenerated": {"learned", "exerciseFailed"},
+    # Reteaching after a failed attempt revisits one of the teaching stages
+    "exerciseFailed": {"meaning", "pronunciation", "sentence", "context", "exerciseGenerated", "denied"},
+    "denied": set(),
+    "learned": set(),
+}
+
+# Teaching stages revisited while reteaching a word after a failed exercise,
+# and where they may lead on that retry path
+RETEACH_STAGES = {"meaning", "pronunciation", "sentence", "context"}
+RETEACH_NEXT = {"exerciseGenerated", "denied"}
+
+# A new word may only be picked once the previous one is finished, and starts here
+NEW_WORD_FROM = {None, "denied", "learned"}
+NEW_WORD_STAGES = {"initiated", "scenario"}
+
+
+def transition_error(
+    prev_word: Optional[str],
+    prev_progress: Optional[str],
+    word: Optional[str],
+    progress: Optional[str],
+    retrying: bool = False
+) -> Optional[str]:
+    """
+    Returns a short description of why moving from (prev_word, prev_progress) to
+    (word, progress) breaks the prompt's state machine, or None if it is legal.
+    `retrying` says the current word has already reached "exerciseFailed", so a
+    reteach stage may go straight back to exercises (or be skipped).
+    """
+    if progress not in PROGRESS_STATES:
+        return f"unknown progress '{progress}'"
+    if word is None:
+        if progress is not None:
+            return f"progress '{progress}' without a currentWord"
+        return None
+    if word != prev_word:
+        if prev_progress not in NEW_WORD_FROM:
+            return f"new word '{word}' while '{prev_word}' is at '{prev_progress}'"
+        if progress not in NEW_WORD_STAGES:
+            return f"new word '{word}' starts at '{progress}'"
+        return None
+    if progress == prev_progress or progress in ALLOWED_NEXT.get(prev_progress, set()):
+        return None
+    if retrying and prev_progress in RETEACH_STAGES and progress in RETEACH_NEXT:
+        return None
+    return f"'{prev_progress}' -> '{progress}'"
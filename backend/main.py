@@ -1,10 +1,24 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from .routers.session import router as session_router
-from .models.db import init_db
+from .services.warmup import warm_up, shutdown
 from fastapi.middleware.cors import CORSMiddleware
 from .routers.speech import router as speech_router
+from .routers.session_ws import router as session_ws_router
+from .routers.health import router as health_router
+import asyncio
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm up in the background so the server starts accepting connections right
+    # away; /ready reports when the warm-up has finished.
+    warm_up_task = asyncio.create_task(warm_up())
+    yield
+    if not warm_up_task.done():
+        warm_up_task.cancel()
+    await shutdown()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -16,7 +30,5 @@ app.add_middleware(
 
 app.include_router(session_router)
 app.include_router(speech_router)
-
-@app.on_event("startup")
-async def on_startup():
-    await init_db() 
\ No newline at end of file
+app.include_router(session_ws_router)
+app.include_router(health_router)
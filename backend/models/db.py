@@ -1,6 +1,7 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base, relationship
 from sqlalchemy import Column, String, JSON, ForeignKey, DateTime, func
+import asyncio
 import uuid
 
 DATABASE_URL = "sqlite+aiosqlite:///./db.sqlite3"
@@ -27,6 +28,20 @@ class Session(Base):
     message_history = Column(JSON, default=list) # list of messages
     user = relationship("User", back_populates="sessions")
 
+_db_initialized = False
+_db_init_lock = asyncio.Lock()
+
 async def init_db():
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all) 
\ No newline at end of file
+    """
+    Creates missing tables. Only the first call does any work, so request paths
+    can await it cheaply in case they run before the startup warm-up has.
+    """
+    global _db_initialized
+    if _db_initialized:
+        return
+    async with _db_init_lock:
+        if _db_initialized:
+            return
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        _db_initialized = True 
\ No newline at end of file
@@ -0,0 +1,32 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse, PlainTextResponse
+from ..services.warmup import warm_up
+from ..services.admission import render_metrics
+
+router = APIRouter()
+
+
+@router.get("/health")
+async def health():
+    """
+    Liveness probe: the process is up and serving requests.
+    """
+    return {"status": "ok"}
+
+
+@router.get("/ready")
+async def ready():
+    """
+    Readiness probe: runs (or waits for) the warm-up and reports 503 until it succeeds.
+    """
+    if not await warm_up():
+        return JSONResponse(status_code=503, content={"status": "warming_up"})
+    return {"status": "ready"}
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Admission-control metrics (queue wait time, queue depth, rejections) in Prometheus text format.
+    """
+    return render_metrics()
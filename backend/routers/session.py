@@ -1,9 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from ..models.db import AsyncSessionLocal, User, Session
+from ..models.db import AsyncSessionLocal, User, Session, init_db
 from ..schemas.session import StartSessionRequest, StartSessionResponse, ContinueSessionRequest
 from ..services.openai_service import get_system_prompt, stream_llm_response
+from ..services.admission import AdmissionRejected, admit_chat, token_quota, too_many_requests
 from ..utils.greeting import get_greeting
 from fastapi.responses import StreamingResponse, FileResponse, JSONResponse
 import uuid
@@ -19,6 +20,7 @@ logger = logging.getLogger(__name__) # Setup logger
 session_last_word = {}
 
 async def get_db():
+    await init_db()
     async with AsyncSessionLocal() as session:
         yield session
 
@@ -158,6 +160,7 @@ async def start_session(data: StartSessionRequest, db: AsyncSession = Depends(ge
 @router.post("/session/continue")
 async def continue_session(
     data: ContinueSessionRequest,
+    request: Request,
     background_tasks: BackgroundTasks, # Inject BackgroundTasks
     db: AsyncSession = Depends(get_db)
 ):
@@ -202,12 +205,24 @@ async def continue_session(
         # Don't rollback here as no changes intended for commit yet (following Option B)
         raise HTTPException(status_code=500, detail="Internal server error preparing session.")
 
+    # Rate limits, daily quota and a bounded queue for generation slots
+    try:
+        slot = await admit_chat(request.client.host if request.client else None, user_id)
+    except AdmissionRejected as e:
+        logger.warning(f"Rejected continue for session {data.session_id}: {e.detail}")
+        raise too_many_requests(e)
+    # Fallback release in case the stream is never iterated (release is idempotent)
+    background_tasks.add_task(slot.release)
+
+    def record_usage(prompt_tokens: int, completion_tokens: int):
+        token_quota.record(user_id, prompt_tokens + completion_tokens)
+
     # --- Generator that streams and triggers background task ---
     async def llm_stream_and_trigger_update():
         buffer = ""
         stream_has_error = False
         try:
-            async for chunk in stream_llm_response(current_message_history):
+            async for chunk in stream_llm_response(current_message_history, on_usage=record_usage):
                 buffer += chunk
                 # Check if the chunk *is* the error JSON payload yielded by the stream
                 try:
@@ -253,6 +268,8 @@ async def continue_session(
             logger.error(f"Error during LLM stream consumption for session {data.session_id}: {e}", exc_info=True)
             # Yield a generic error if the stream fails unexpectedly
             yield json.dumps({"error": "Internal Server Error", "detail": "LLM streaming failed unexpectedly."}) 
+        finally:
+            slot.release()
 
     return StreamingResponse(llm_stream_and_trigger_update(), media_type="application/json") 
 
@@ -0,0 +1,236 @@
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from sqlalchemy.future import select
+from pydantic import ValidationError
+from contextlib import suppress
+from typing import Any, Dict, List, Optional
+from ..models.db import AsyncSessionLocal, User, Session, init_db
+from ..schemas.session import SessionSocketMessage
+from ..services.openai_service import get_system_prompt, stream_llm_response
+from ..services.admission import AdmissionRejected, admit_chat, token_quota
+from .session import update_db_after_stream
+import asyncio
+import json
+import logging
+import math
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Max number of outbound events buffered per connection. When a slow client lets
+# this fill up, the generation task blocks on put() and stops pulling tokens from
+# the LLM stream until the client catches up.
+OUTBOX_MAXSIZE = 32
+
+
+async def pump_outbox(websocket: WebSocket, outbox: asyncio.Queue):
+    """
+    Sends queued events to the client one at a time.
+    This is the only task that writes to the socket, so events never interleave.
+    """
+    while True:
+        event = await outbox.get()
+        await websocket.send_json(event)
+
+
+def post_control(outbox: asyncio.Queue, event: Dict[str, Any]):
+    """
+    Queues an event from the receive loop without ever waiting on the client.
+    If a slow client has filled the outbox the event is dropped, so the loop
+    keeps reading and a later "cancel" still gets through.
+    """
+    try:
+        outbox.put_nowait(event)
+    except asyncio.QueueFull:
+        logger.warning(f"Outbox full, dropped {event.get('error')} event")
+
+
+async def run_generation(
+    outbox: asyncio.Queue,
+    session_id: str,
+    user_id: str,
+    message_history: List[Dict[str, Any]],
+    user_message: str,
+    stream_done: Optional[asyncio.Event] = None
+):
+    """
+    Streams one assistant turn as typed events: "delta" chunks followed by
+    "done", "error" or "cancelled". On success the turn is persisted and the
+    in-memory history extended before "done" is sent.
+    `stream_done` is set once the LLM stream has finished; from then on the turn
+    can no longer be cancelled.
+    """
+    turn_history = message_history + [{"role": "user", "content": user_message}]
+    buffer = ""
+
+    def record_usage(prompt_tokens: int, completion_tokens: int):
+        token_quota.record(user_id, prompt_tokens + completion_tokens)
+
+    stream = None
+    try:
+        try:
+            stream = stream_llm_response(turn_history, on_usage=record_usage)
+            async for chunk in stream:
+                try:
+                    chunk_json = json.loads(chunk)
+                except json.JSONDecodeError:
+                    chunk_json = None
+                if isinstance(chunk_json, dict) and "error" in chunk_json:
+                    logger.warning(f"LLM stream for session {session_id} yielded an error chunk: {chunk_json.get('detail')}")
+                    await outbox.put({"type": "error", "error": chunk_json["error"], "detail": chunk_json.get("detail")})
+                    return
+                buffer += chunk
+                await outbox.put({"type": "delta", "content": chunk})
+        finally:
+            # Close the generator right away on cancellation, which closes the
+            # upstream OpenAI stream as well.
+            if stream is not None:
+                await stream.aclose()
+    except asyncio.CancelledError:
+        logger.info(f"Generation cancelled for session {session_id} after {len(buffer)} chars.")
+        # Deltas still queued are stale now; drop them so "cancelled" goes out next
+        # without waiting on a slow client.
+        while not outbox.empty():
+            outbox.get_nowait()
+        outbox.put_nowait({"type": "cancelled"})
+        return
+    except Exception as e:
+        logger.error(f"Error during LLM stream consumption for session {session_id}: {e}", exc_info=True)
+        await outbox.put({"type": "error", "error": "Internal Server Error", "detail": "LLM streaming failed unexpectedly."})
+        return
+
+    if stream_done:
+        stream_done.set()
+
+    if not buffer:
+        logger.warning(f"LLM stream for session {session_id} produced no output. DB update skipped.")
+        await outbox.put({"type": "error", "error": "Internal Server Error", "detail": "LLM stream produced no output."})
+        return
+
+    try:
+        response_json = json.loads(buffer)
+    except json.JSONDecodeError:
+        response_json = None
+    if not isinstance(response_json, dict):
+        # update_db_after_stream drops such a turn, so leave it out of the warm history too
+        logger.warning(f"LLM stream for session {session_id} produced invalid JSON. Turn dropped.")
+        await outbox.put({"type": "error", "error": "Internal Server Error", "detail": "LLM response was not valid JSON."})
+        return
+
+    save = asyncio.ensure_future(update_db_after_stream(
+        session_id=session_id,
+        user_id=user_id,
+        user_message=user_message,
+        assistant_response_buffer=buffer
+    ))
+    try:
+        await asyncio.shield(save)
+    except asyncio.CancelledError:
+        # Only a closing socket cancels a finished stream; the reply is complete, so still save it
+        await save
+        return
+
+    # Keep the warm history in step with what update_db_after_stream persists
+    message_history.append({"role": "user", "content": user_message})
+    message_history.append({"role": "assistant", "content": buffer})
+    await outbox.put({"type": "done", "response": response_json})
+
+
+@router.websocket("/ws/session/{session_id}")
+async def session_socket(websocket: WebSocket, session_id: str):
+    """
+    Chat loop over a single WebSocket connection.
+    The session, user and system prompt are loaded once on connect and kept in
+    memory. Client messages:
+      {"type": "message", "user_message": "..."}  start a generation
+      {"type": "cancel"}                           abort the running generation
+    """
+    await websocket.accept()
+
+    try:
+        await init_db()
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(Session).where(Session.id == session_id))
+            session_obj = result.scalar_one_or_none()
+            if not session_obj:
+                logger.warning(f"Attempted to open socket for non-existent session: {session_id}")
+                await websocket.close(code=4404, reason="Session not found")
+                return
+
+            user_result = await db.execute(select(User).where(User.id == session_obj.user_id))
+            user = user_result.scalar_one_or_none()
+            if not user:
+                logger.error(f"User {session_obj.user_id} not found for existing session {session_id}")
+                await websocket.close(code=4404, reason="User associated with session not found")
+                return
+    except Exception as e:
+        logger.error(f"Error preparing session {session_id} for socket: {e}", exc_info=True)
+        await websocket.close(code=1011, reason="Internal server error preparing session.")
+        return
+
+    user_id = user.id
+    client_ip = websocket.client.host if websocket.client else None
+    message_history = list(session_obj.message_history or [])
+    if not any(m["role"] == "system" for m in message_history):
+        user_info = {
+            "name": user.user_name,
+            "sourceLanguage": user.source_language,
+            "targetLanguage": user.target_language,
+        }
+        message_history.insert(0, {"role": "system", "content": get_system_prompt(user_info)})
+
+    outbox: asyncio.Queue = asyncio.Queue(maxsize=OUTBOX_MAXSIZE)
+    sender = asyncio.create_task(pump_outbox(websocket, outbox))
+    generation: Optional[asyncio.Task] = None
+    stream_done = asyncio.Event()
+
+    try:
+        while True:
+            try:
+                message = SessionSocketMessage(**await websocket.receive_json())
+            except (ValidationError, TypeError, ValueError) as e:
+                post_control(outbox, {"type": "error", "error": "Invalid message", "detail": str(e)})
+                continue
+
+            if message.type == "cancel":
+                # A turn whose stream has finished is already being saved and will end in "done"
+                if generation and not generation.done() and not stream_done.is_set():
+                    generation.cancel()
+                continue
+
+            if message.type == "message":
+                if not message.user_message:
+                    post_control(outbox, {"type": "error", "error": "Invalid message", "detail": "user_message is required."})
+                    continue
+                if generation and not generation.done():
+                    post_control(outbox, {"type": "error", "error": "Busy", "detail": "A generation is already running."})
+                    continue
+                try:
+                    slot = await admit_chat(client_ip, user_id)
+                except AdmissionRejected as e:
+                    logger.warning(f"Rejected socket message for session {session_id}: {e.detail}")
+                    post_control(outbox, {
+                        "type": "error",
+                        "error": "Too Many Requests",
+                        "detail": e.detail,
+                        "retry_after": max(1, math.ceil(e.retry_after)),
+                    })
+                    continue
+                stream_done = asyncio.Event()
+                generation = asyncio.create_task(run_generation(
+                    outbox, session_id, user_id, message_history, message.user_message, stream_done
+                ))
+                generation.add_done_callback(lambda _, slot=slot: slot.release())
+                continue
+
+            post_control(outbox, {"type": "error", "error": "Invalid message", "detail": f"Unknown message type '{message.type}'."})
+    except WebSocketDisconnect:
+        logger.info(f"Socket closed for session {session_id}")
+    finally:
+        for task in (generation, sender):
+            if not task:
+                continue
+            if not task.done():
+                task.cancel()
+            # Awaiting also retrieves the exception of a sender that died on a failed send
+            with suppress(asyncio.CancelledError, Exception):
+                await task
@@ -1,56 +1,195 @@
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import FileResponse, JSONResponse
-from gtts import gTTS, gTTSError
-import os
-from pathlib import Path
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy.future import select
+from typing import Optional, Tuple
+from ..models.db import AsyncSessionLocal, User, Session, init_db
+from ..schemas.speech import SpeechBatchRequest, SpeechBatchResponse, SpeechClip, SpeechClipRequest
+from ..services.tts_service import (
+    SPEEDS, VOICES, cache_key, cache_path, get_tts, normalize_text,
+    resolve_language, stream_speech, synthesize,
+)
+from ..services.admission import AdmissionRejected, speech_limiter, speech_queue, too_many_requests
+import asyncio
+import base64
 import logging
+import math
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-# Directory to store generated audio files
-temp_dir = Path("tmp")
-temp_dir.mkdir(exist_ok=True)
+# Longest text (a word, phrase or example sentence) /speech will synthesize
+MAX_SPEECH_CHARS = 300
 
+# Most clips a single /speech/batch request may ask for
+MAX_BATCH_CLIPS = 10
 
-def get_audio_path(word: str) -> Path:
+DEFAULT_LANGUAGE = "en"
+
+
+async def get_session_language(session_id: str) -> Optional[str]:
     """
-    Returns the path for the cached audio file for the given word (English only).
+    Returns the target language of the learner who owns the session, if any.
     """
-    safe_word = word.lower()
-    filename = f"{safe_word}_en.mp3"
-    return temp_dir / filename
+    await init_db()
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(User.target_language).join(Session, Session.user_id == User.id).where(Session.id == session_id)
+        )
+        return result.scalar_one_or_none()
 
 
-@router.get("/speech/{word}")
-async def get_word_speech(word: str):
+def validate_clip(
+    text: str,
+    lang: Optional[str],
+    voice: str,
+    speed: str,
+    session_lang: Optional[str] = None
+) -> Tuple[str, str]:
     """
-    Generates (if needed) and serves an mp3 speech file for the given word in English.
-    The word in the URL must be lowercase.
+    Returns (normalized text, gTTS language code) or raises ValueError.
+    An explicit `lang` must be speakable; a session language that isn't falls
+    back to DEFAULT_LANGUAGE.
     """
-    if not word:
-        raise HTTPException(status_code=400, detail="Word is required.")
+    text = normalize_text(text)
+    if not text:
+        raise ValueError("Text is required.")
+    if len(text) > MAX_SPEECH_CHARS:
+        raise ValueError(f"Text must be at most {MAX_SPEECH_CHARS} characters.")
+    if voice not in VOICES:
+        raise ValueError(f"Unknown voice '{voice}'. Choose one of: {', '.join(VOICES)}.")
+    if speed not in SPEEDS:
+        raise ValueError(f"Unknown speed '{speed}'. Choose one of: {', '.join(SPEEDS)}.")
+    if lang:
+        return text, resolve_language(lang)
+    if session_lang:
+        try:
+            return text, resolve_language(session_lang)
+        except ValueError:
+            logger.info(f"No speech for session language '{session_lang}', using '{DEFAULT_LANGUAGE}'")
+    return text, resolve_language(DEFAULT_LANGUAGE)
+
 
-    word = word.lower()
-    lang = "en"
-    audio_path = get_audio_path(word)
+def check_rate(request: Request, cost: int = 1):
+    try:
+        if request.client:
+            speech_limiter.check(request.client.host, cost)
+    except AdmissionRejected as e:
+        raise too_many_requests(e)
 
-    if not audio_path.exists():
+
+@router.get("/speech/{text}")
+async def get_speech(
+    text: str,
+    request: Request,
+    lang: Optional[str] = None,
+    voice: str = "default",
+    speed: str = "normal",
+    session_id: Optional[str] = None
+):
+    """
+    Streams an mp3 of the given word, phrase or sentence as it is synthesized.
+    The language is `lang` (code or name), else the session learner's target
+    language (English if gTTS can't speak it), else English. Clips are cached
+    by (text, lang, voice, speed).
+    Requests are rate limited per IP and synthesis runs in a bounded queue.
+    """
+    check_rate(request)
+    session_lang = await get_session_language(session_id) if not lang and session_id else None
+    try:
+        text, lang_code = validate_clip(text, lang, voice, speed, session_lang)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    gtts = get_tts()
+    key = cache_key(text, lang_code, voice, speed)
+    slot = None
+    if not cache_path(key).exists():
         try:
-            tts = gTTS(text=word, lang=lang)
-            tts.save(str(audio_path))
-        except (ValueError, gTTSError) as e:
-            logger.error(f"gTTS error for word '{word}' and lang '{lang}': {e}")
-            return JSONResponse(status_code=400, content={"error": "Speech synthesis failed", "detail": str(e)})
-        except Exception as e:
-            logger.error(f"Unexpected error during speech synthesis: {e}")
-            return JSONResponse(status_code=500, content={"error": "Internal server error", "detail": str(e)})
+            slot = await speech_queue.acquire()
+        except AdmissionRejected as e:
+            logger.warning(f"Rejected speech synthesis for '{text}': {e.detail}")
+            raise too_many_requests(e)
 
-    if not audio_path.exists():
-        raise HTTPException(status_code=500, detail="Failed to generate audio file.")
+    # The slot is held until synthesis itself finishes, not until the client stops
+    # reading, so a disconnect doesn't let more gTTS threads run than the queue allows.
+    # Pull the first part before answering so synthesis errors still get a proper status code.
+    audio = stream_speech(text, lang_code, voice, speed, on_done=slot.release if slot else None)
+    error_response = None
+    try:
+        first_part = await audio.__anext__()
+    except (ValueError, gtts.gTTSError) as e:
+        logger.error(f"gTTS error for text '{text}' and lang '{lang_code}': {e}")
+        error_response = JSONResponse(status_code=400, content={"error": "Speech synthesis failed", "detail": str(e)})
+    except StopAsyncIteration:
+        error_response = JSONResponse(status_code=500, content={"error": "Internal server error", "detail": "Failed to generate audio."})
+    except Exception as e:
+        logger.error(f"Unexpected error during speech synthesis: {e}")
+        error_response = JSONResponse(status_code=500, content={"error": "Internal server error", "detail": str(e)})
+    if error_response:
+        return error_response
+
+    async def audio_stream():
+        try:
+            yield first_part
+            async for part in audio:
+                yield part
+        except Exception as e:
+            logger.error(f"Speech stream for '{text}' failed midway: {e}")
 
-    return FileResponse(
-        path=audio_path,
+    return StreamingResponse(
+        audio_stream(),
         media_type="audio/mpeg",
-        filename=audio_path.name
-    ) 
\ No newline at end of file
+        headers={
+            "Content-Disposition": f'inline; filename="{key}.mp3"',
+            "Cache-Control": "public, max-age=86400",
+        },
+    )
+
+
+@router.post("/speech/batch", response_model=SpeechBatchResponse)
+async def get_speech_batch(data: SpeechBatchRequest, request: Request):
+    """
+    Returns several clips (base64 mp3) in one response, e.g. every word and
+    example sentence of a pronunciation stage. Clips that fail carry an error
+    instead of audio; the rest are still returned.
+    """
+    if not data.clips:
+        raise HTTPException(status_code=400, detail="At least one clip is required.")
+    if len(data.clips) > MAX_BATCH_CLIPS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_CLIPS} clips per request.")
+    check_rate(request, cost=len(data.clips))
+
+    session_lang = await get_session_language(data.session_id) if data.session_id else None
+    gtts = get_tts()
+
+    async def build_clip(clip: SpeechClipRequest) -> SpeechClip:
+        result = SpeechClip(text=clip.text, voice=clip.voice, speed=clip.speed)
+        try:
+            text, result.lang = validate_clip(clip.text, clip.lang, clip.voice, clip.speed, session_lang)
+        except ValueError as e:
+            result.error = str(e)
+            return result
+        result.key = cache_key(text, result.lang, clip.voice, clip.speed)
+
+        slot = None
+        if not cache_path(result.key).exists():
+            try:
+                slot = await speech_queue.acquire()
+            except AdmissionRejected as e:
+                result.error = e.detail
+                result.retry_after = max(1, math.ceil(e.retry_after))
+                return result
+        try:
+            audio = await synthesize(
+                text, result.lang, clip.voice, clip.speed, on_done=slot.release if slot else None
+            )
+            result.audio = base64.b64encode(audio).decode("ascii")
+        except (ValueError, gtts.gTTSError) as e:
+            logger.error(f"gTTS error for text '{text}' and lang '{result.lang}': {e}")
+            result.error = f"Speech synthesis failed: {e}"
+        except Exception as e:
+            logger.error(f"Unexpected error during speech synthesis: {e}")
+            result.error = "Internal server error"
+        return result
+
+    return SpeechBatchResponse(clips=await asyncio.gather(*(build_clip(clip) for clip in data.clips)))
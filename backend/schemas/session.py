@@ -1,3 +1,4 @@
+from typing import Optional
 from pydantic import BaseModel
 
 class StartSessionRequest(BaseModel):
@@ -11,4 +12,8 @@ class StartSessionResponse(BaseModel):
 
 class ContinueSessionRequest(BaseModel):
     session_id: str
-    user_message: str 
\ No newline at end of file
+    user_message: str 
+
+class SessionSocketMessage(BaseModel):
+    type: str  # "message" or "cancel"
+    user_message: Optional[str] = None
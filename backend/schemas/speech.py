@@ -0,0 +1,25 @@
+from typing import List, Optional
+from pydantic import BaseModel
+
+class SpeechClipRequest(BaseModel):
+    text: str
+    lang: Optional[str] = None  # language code or name; defaults to the batch/session language
+    voice: str = "default"
+    speed: str = "normal"
+
+class SpeechBatchRequest(BaseModel):
+    clips: List[SpeechClipRequest]
+    session_id: Optional[str] = None  # used for the learner's target language
+
+class SpeechClip(BaseModel):
+    text: str
+    lang: Optional[str] = None
+    voice: str
+    speed: str
+    key: Optional[str] = None
+    audio: Optional[str] = None  # base64-encoded mp3
+    error: Optional[str] = None
+    retry_after: Optional[int] = None
+
+class SpeechBatchResponse(BaseModel):
+    clips: List[SpeechClip]
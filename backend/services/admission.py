@@ -0,0 +1,233 @@
+"""
+Admission control for the expensive endpoints: per-key token buckets, daily
+LLM token quotas and bounded request queues.
+
+All state is in process memory, so limits apply per worker process.
+Limits can be tuned with the environment variables read below.
+"""
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from fastapi import HTTPException
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, default))
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, detail: str, retry_after: float):
+        super().__init__(detail)
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+def too_many_requests(exc: AdmissionRejected) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail=exc.detail,
+        headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))},
+    )
+
+
+class RateLimiter:
+    """
+    Token bucket per key: `burst` requests at once, refilled at `rate_per_minute`.
+    Keeps at most `max_keys` buckets, evicting the least recently used.
+    """
+
+    def __init__(self, name: str, rate_per_minute: float, burst: float, max_keys: int = 10000):
+        self.name = name
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.max_keys = max_keys
+        self.limited = 0
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()  # key -> [tokens, updated]
+
+    def check(self, key: str, cost: float = 1):
+        """
+        Takes `cost` tokens for `key` or raises AdmissionRejected with the time until they are available.
+        """
+        now = time.monotonic()
+        bucket = self._buckets.pop(key, None) or [self.burst, now]
+        tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        allowed = tokens >= cost
+        self._buckets[key] = [tokens - cost if allowed else tokens, now]
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        if not allowed:
+            self.limited += 1
+            raise AdmissionRejected("Rate limit exceeded.", (cost - tokens) / self.rate)
+
+
+class DailyTokenQuota:
+    """
+    LLM tokens (prompt + completion) used per user per UTC day, as reported by the stream
+    (or estimated, for streams that end before reporting usage).
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.exceeded = 0
+        self._day = None
+        self._used: Dict[str, int] = defaultdict(int)
+
+    def _roll(self):
+        today = datetime.now(timezone.utc).date()
+        if today != self._day:
+            self._day = today
+            self._used.clear()
+
+    def record(self, user_id: str, tokens: int):
+        self._roll()
+        self._used[user_id] += tokens
+
+    def check(self, user_id: str):
+        """
+        Raises AdmissionRejected, retrying at the next UTC midnight, once the user is over quota.
+        """
+        self._roll()
+        if self._used[user_id] >= self.limit:
+            self.exceeded += 1
+            now = datetime.now(timezone.utc)
+            midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), timezone.utc)
+            raise AdmissionRejected("Daily token quota exceeded.", (midnight - now).total_seconds())
+
+
+class AdmissionSlot:
+    def __init__(self, queue: "AdmissionQueue"):
+        self._queue = queue
+        self._released = False
+
+    def release(self):
+        """
+        Frees the slot. Safe to call more than once.
+        """
+        if not self._released:
+            self._released = True
+            self._queue._semaphore.release()
+
+
+class AdmissionQueue:
+    """
+    Runs at most `max_concurrent` requests at a time with up to `max_waiting`
+    more queued behind them. A full queue, or a wait longer than `max_wait`
+    seconds, is rejected right away so clients get a fast 429 instead of a
+    request that hangs.
+    """
+
+    # Upper bounds (seconds) of the queue wait histogram buckets
+    WAIT_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, name: str, max_concurrent: int, max_waiting: int, max_wait: float):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_waiting
+        self.max_wait = max_wait
+        self.waiting = 0
+        self.rejected: Dict[str, int] = defaultdict(int)
+        self.wait_counts = [0] * len(self.WAIT_BUCKETS)
+        self.wait_sum = 0.0
+        self.wait_count = 0
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+
+    @property
+    def in_flight(self) -> int:
+        return self.max_concurrent - self._semaphore._value
+
+    def _observe(self, seconds: float):
+        self.wait_sum += seconds
+        self.wait_count += 1
+        for i, bound in enumerate(self.WAIT_BUCKETS):
+            if seconds <= bound:
+                self.wait_counts[i] += 1
+
+    async def acquire(self) -> AdmissionSlot:
+        if self._semaphore.locked() and self.waiting >= self.max_waiting:
+            self.rejected["full"] += 1
+            raise AdmissionRejected("Server is busy, try again shortly.", self.max_wait)
+        self.waiting += 1
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.max_wait)
+        except asyncio.TimeoutError:
+            self.rejected["timeout"] += 1
+            raise AdmissionRejected("Server is busy, try again shortly.", self.max_wait)
+        finally:
+            self.waiting -= 1
+        self._observe(time.monotonic() - started)
+        return AdmissionSlot(self)
+
+
+ip_limiter = RateLimiter(
+    "ip",
+    _env_float("RATE_LIMIT_IP_PER_MINUTE", 30),
+    _env_float("RATE_LIMIT_IP_BURST", 10),
+)
+user_limiter = RateLimiter(
+    "user",
+    _env_float("RATE_LIMIT_USER_PER_MINUTE", 12),
+    _env_float("RATE_LIMIT_USER_BURST", 5),
+)
+speech_limiter = RateLimiter(
+    "speech_ip",
+    _env_float("RATE_LIMIT_SPEECH_PER_MINUTE", 60),
+    _env_float("RATE_LIMIT_SPEECH_BURST", 20),
+)
+token_quota = DailyTokenQuota(int(_env_float("DAILY_TOKEN_QUOTA", 200_000)))
+chat_queue = AdmissionQueue(
+    "chat",
+    int(_env_float("CHAT_MAX_CONCURRENT", 16)),
+    int(_env_float("CHAT_MAX_QUEUED", 32)),
+    _env_float("CHAT_MAX_QUEUE_WAIT", 5.0),
+)
+speech_queue = AdmissionQueue(
+    "speech",
+    int(_env_float("SPEECH_MAX_CONCURRENT", 4)),
+    int(_env_float("SPEECH_MAX_QUEUED", 16)),
+    _env_float("SPEECH_MAX_QUEUE_WAIT", 5.0),
+)
+
+
+async def admit_chat(ip: Optional[str], user_id: str) -> AdmissionSlot:
+    """
+    Applies the IP and user buckets and the user's daily quota, then waits for a chat slot.
+    Callers must release() the slot once the generation ends.
+    """
+    if ip:
+        ip_limiter.check(ip)
+    user_limiter.check(user_id)
+    token_quota.check(user_id)
+    return await chat_queue.acquire()
+
+
+def render_metrics() -> str:
+    """
+    Admission metrics in the Prometheus text exposition format.
+    """
+    lines = [
+        "# HELP admission_queue_wait_seconds Time requests waited for an admission slot.",
+        "# TYPE admission_queue_wait_seconds histogram",
+    ]
+    for queue in (chat_queue, speech_queue):
+        for bound, count in zip(queue.WAIT_BUCKETS, queue.wait_counts):
+            lines.append(f'admission_queue_wait_seconds_bucket{{queue="{queue.name}",le="{bound}"}} {count}')
+        lines.append(f'admission_queue_wait_seconds_bucket{{queue="{queue.name}",le="+Inf"}} {queue.wait_count}')
+        lines.append(f'admission_queue_wait_seconds_sum{{queue="{queue.name}"}} {queue.wait_sum}')
+        lines.append(f'admission_queue_wait_seconds_count{{queue="{queue.name}"}} {queue.wait_count}')
+    lines += ["# HELP admission_queue_waiting Requests currently queued.", "# TYPE admission_queue_waiting gauge"]
+    lines += [f'admission_queue_waiting{{queue="{q.name}"}} {q.waiting}' for q in (chat_queue, speech_queue)]
+    lines += ["# HELP admission_in_flight Requests currently holding a slot.", "# TYPE admission_in_flight gauge"]
+    lines += [f'admission_in_flight{{queue="{q.name}"}} {q.in_flight}' for q in (chat_queue, speech_queue)]
+    lines += ["# HELP admission_rejected_total Requests rejected with 429.", "# TYPE admission_rejected_total counter"]
+    for queue in (chat_queue, speech_queue):
+        for reason in ("full", "timeout"):
+            lines.append(f'admission_rejected_total{{queue="{queue.name}",reason="{reason}"}} {queue.rejected[reason]}')
+    for limiter in (ip_limiter, user_limiter, speech_limiter):
+        lines.append(f'admission_rejected_total{{queue="rate_limit",reason="{limiter.name}"}} {limiter.limited}')
+    lines.append(f'admission_rejected_total{{queue="quota",reason="daily_tokens"}} {token_quota.exceeded}')
+    return "\n".join(lines) + "\n"
@@ -1,17 +1,69 @@
 import os
-from openai import OpenAI, APIError, RateLimitError, APITimeoutError, BadRequestError
-from typing import Any, List, Dict
-from dotenv import load_dotenv
+from functools import lru_cache
+from typing import Any, Callable, List, Dict, Optional, Tuple, TYPE_CHECKING
 import json
 import logging
 
-load_dotenv()
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
 
-api_key = os.getenv("OPENAI_API_KEY")
-client = OpenAI(api_key=api_key)
 logger = logging.getLogger(__name__)
 
+DEFAULT_MODEL = "gpt-4.1"
+
+# Created on first use (or by the lifespan warm-up) rather than at import time:
+# importing openai alone costs more than half of the app's cold start.
+_client = None
+
+def get_client() -> "AsyncOpenAI":
+    """
+    Returns the shared AsyncOpenAI client, importing openai and loading .env on first call.
+    """
+    global _client
+    if _client is None:
+        from dotenv import load_dotenv
+        from openai import AsyncOpenAI
+
+        load_dotenv()
+        _client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    return _client
+
+async def open_connection(timeout: float = 2.0) -> bool:
+    """
+    Makes a cheap authenticated request (the default model's metadata) so the
+    client's pool holds an open TCP/TLS connection before the first chat turn.
+    Returns False instead of raising if the API can't be reached in time.
+    """
+    try:
+        await get_client().with_options(max_retries=0, timeout=timeout).models.retrieve(DEFAULT_MODEL)
+        return True
+    except Exception as e:
+        logger.warning(f"Could not open a connection to the OpenAI API: {e}")
+        return False
+
+async def close_client():
+    """
+    Closes the shared client's connection pool, if it was ever created.
+    """
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
 def get_system_prompt(user_info: dict) -> str:
+    return _build_system_prompt(
+        user_info['name'],
+        user_info['sourceLanguage'],
+        user_info['targetLanguage'],
+    )
+
+@lru_cache(maxsize=256)
+def _build_system_prompt(name: str, source_language: str, target_language: str) -> str:
+    user_info = {
+        "name": name,
+        "sourceLanguage": source_language,
+        "targetLanguage": target_language,
+    }
     return f"""
 
 Act like a professional multilingual vocabulary teacher with 20 years of experience. You specialize in immersive, structured vocabulary learning. You are helping a student grow their vocabulary in their **target language: {user_info['targetLanguage']}**, while their native language is **{user_info['sourceLanguage']}**.
@@ -284,23 +336,55 @@ Take a deep breath and work on this problem step-by-step.
 
 """
 
-async def stream_llm_response(messages: List[Dict[str, Any]]):
+def estimate_tokens(messages: List[Dict[str, Any]], completion_chars: int) -> Tuple[int, int]:
+    """
+    Rough (prompt_tokens, completion_tokens) at ~4 characters per token, for
+    streams that end before the provider reports usage.
+    """
+    prompt_chars = sum(len(str(m.get("content") or "")) for m in messages)
+    return prompt_chars // 4, completion_chars // 4
+
+async def stream_llm_response(
+    messages: List[Dict[str, Any]],
+    client: Optional["AsyncOpenAI"] = None,
+    model: str = DEFAULT_MODEL,
+    on_usage: Optional[Callable[[int, int], None]] = None,
+    estimate_usage: bool = True
+):
     """
     Streams the LLM response chunk by chunk.
     Handles potential OpenAI API errors and yields an error JSON if encountered.
+    Closing the generator early (e.g. a cancelled generation) closes the upstream
+    HTTP stream so OpenAI stops producing tokens.
+
+    `client` may be any AsyncOpenAI-compatible client (defaults to the shared one).
+    `on_usage(prompt_tokens, completion_tokens)` is called once with the usage
+    reported at the end of the stream. If the stream ends without it (cancelled,
+    dropped, or failed midway) and `estimate_usage` is set, it is called with an
+    estimate instead, since the prompt has been paid for either way.
     """
+    from openai import APIError, RateLimitError, APITimeoutError, BadRequestError
+
     error_payload = None
+    response = None
+    usage_reported = False
+    completion_chars = 0
     try:
-        response = client.chat.completions.create(
-            model="gpt-4.1",
+        response = await (client or get_client()).chat.completions.create(
+            model=model,
             messages=messages,
             response_format={"type": "json_object"},
             stream=True,
+            stream_options={"include_usage": True},
             temperature=0.3,
         )
-        for chunk in response:
+        async for chunk in response:
             if chunk.choices and chunk.choices[0].delta and chunk.choices[0].delta.content:
+                completion_chars += len(chunk.choices[0].delta.content)
                 yield chunk.choices[0].delta.content
+            if getattr(chunk, "usage", None) and on_usage:
+                usage_reported = True
+                on_usage(chunk.usage.prompt_tokens, chunk.usage.completion_tokens)
     except (APIError, RateLimitError, APITimeoutError, BadRequestError) as e:
         logger.error(f"OpenAI API error during streaming: {e}", exc_info=True)
         error_payload = json.dumps({
@@ -313,6 +397,13 @@ async def stream_llm_response(messages: List[Dict[str, Any]]):
             "error": "Internal Server Error",
             "detail": "An unexpected error occurred while communicating with the language model."
         })
+    finally:
+        if response is not None:
+            await response.close()
+        # A request that the API rejected outright (no response, error payload set) isn't billed
+        request_billed = response is not None or error_payload is None
+        if on_usage and estimate_usage and not usage_reported and request_billed:
+            on_usage(*estimate_tokens(messages, completion_chars))
 
     if error_payload:
         yield error_payload 
\ No newline at end of file
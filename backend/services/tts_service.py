@@ -0,0 +1,170 @@
+import asyncio
+import hashlib
+import json
+import os
+import uuid
+from functools import lru_cache
+from pathlib import Path
+from types import ModuleType
+from typing import AsyncIterator, Callable, Dict, Optional
+
+# Content-addressed cache: one mp3 per (text, lang, voice, speed), named by its hash
+SPEECH_CACHE_DIR = Path("tmp") / "speech"
+
+# Chunk size used when streaming a cached clip
+CACHE_READ_CHUNK = 32 * 1024
+
+# gTTS "voices" are regional Google Translate hosts (accents)
+VOICES = {
+    "default": "com",
+    "us": "com",
+    "uk": "co.uk",
+    "au": "com.au",
+    "ca": "ca",
+    "in": "co.in",
+    "ie": "ie",
+    "za": "co.za",
+    "mx": "com.mx",
+    "es": "es",
+    "br": "com.br",
+    "pt": "pt",
+    "fr": "fr",
+}
+
+# gTTS only has a normal and a slowed-down rate
+SPEEDS = {"normal": False, "slow": True}
+
+# Language names the app uses that don't match gTTS's names exactly
+LANGUAGE_ALIASES = {
+    "chinese": "zh-CN",
+    "mandarin": "zh-CN",
+    "portuguese": "pt",
+    "punjabi": "pa",
+}
+
+
+@lru_cache(maxsize=None)
+def get_tts() -> ModuleType:
+    """
+    Imports gTTS on first use so the app does not pay for it at import time.
+    Returns the gtts module (gtts.gTTS, gtts.gTTSError).
+    """
+    import gtts
+
+    return gtts
+
+
+@lru_cache(maxsize=None)
+def supported_languages() -> Dict[str, str]:
+    """
+    Maps gTTS language codes to their names.
+    """
+    from gtts.lang import tts_langs
+
+    return tts_langs()
+
+
+def resolve_language(language: str) -> str:
+    """
+    Returns the gTTS code for a language code ("es") or name ("Spanish").
+    Raises ValueError for languages gTTS can't speak.
+    """
+    languages = supported_languages()
+    key = language.strip()
+    if key in languages:
+        return key
+    lowered = key.lower()
+    if lowered in LANGUAGE_ALIASES:
+        return LANGUAGE_ALIASES[lowered]
+    for code, name in languages.items():
+        if code.lower() == lowered or name.lower() == lowered:
+            return code
+    raise ValueError(f"Speech is not available for language '{language}'.")
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.split())
+
+
+def cache_key(text: str, lang: str, voice: str, speed: str) -> str:
+    payload = json.dumps([normalize_text(text), lang, voice, speed], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def cache_path(key: str) -> Path:
+    return SPEECH_CACHE_DIR / key[:2] / f"{key}.mp3"
+
+
+async def stream_speech(
+    text: str,
+    lang: str,
+    voice: str = "default",
+    speed: str = "normal",
+    on_done: Optional[Callable[[], None]] = None
+) -> AsyncIterator[bytes]:
+    """
+    Yields mp3 bytes for `text`. Cached clips are read from disk; otherwise gTTS
+    synthesizes in a worker thread and each part is yielded as soon as it is ready.
+    The clip is written to the cache even if the consumer stops early.
+    Raises ValueError / gTTSError if synthesis fails before any audio is produced.
+
+    `on_done()` is called on the event loop once no more synthesis work is running
+    (right away for cached clips), which may be after the consumer has gone away.
+    """
+    path = cache_path(cache_key(text, lang, voice, speed))
+    if path.exists():
+        if on_done:
+            on_done()
+        data = await asyncio.to_thread(path.read_bytes)
+        for start in range(0, len(data), CACHE_READ_CHUNK):
+            yield data[start:start + CACHE_READ_CHUNK]
+        return
+
+    gtts = get_tts()
+    try:
+        tts = gtts.gTTS(text=normalize_text(text), lang=lang, tld=VOICES[voice], slow=SPEEDS[speed])
+    except Exception:
+        if on_done:
+            on_done()
+        raise
+    loop = asyncio.get_running_loop()
+    parts: asyncio.Queue = asyncio.Queue()
+
+    def produce():
+        partial = path.with_name(f"{path.name}.{uuid.uuid4().hex}.part")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(partial, "wb") as f:
+                for part in tts.stream():
+                    f.write(part)
+                    loop.call_soon_threadsafe(parts.put_nowait, part)
+            os.replace(partial, path)
+            loop.call_soon_threadsafe(parts.put_nowait, None)
+        except Exception as e:
+            partial.unlink(missing_ok=True)
+            loop.call_soon_threadsafe(parts.put_nowait, e)
+        finally:
+            if on_done:
+                loop.call_soon_threadsafe(on_done)
+
+    loop.run_in_executor(None, produce)
+    while True:
+        part = await parts.get()
+        if part is None:
+            return
+        if isinstance(part, Exception):
+            raise part
+        yield part
+
+
+async def synthesize(
+    text: str,
+    lang: str,
+    voice: str = "default",
+    speed: str = "normal",
+    on_done: Optional[Callable[[], None]] = None
+) -> bytes:
+    """
+    Returns the whole mp3 clip for `text`. `on_done` is as for stream_speech.
+    """
+    return b"".join([part async for part in stream_speech(text, lang, voice, speed, on_done)])
@@ -0,0 +1,53 @@
+import asyncio
+import logging
+import time
+from sqlalchemy import text
+from ..models.db import engine, init_db
+from .openai_service import get_client, close_client, open_connection
+from .tts_service import get_tts
+
+logger = logging.getLogger(__name__)
+
+_ready = False
+_lock = asyncio.Lock()
+
+
+async def warm_up() -> bool:
+    """
+    Does the deferred startup work once: creates tables, opens a pooled DB
+    connection, builds the OpenAI client and opens a pooled connection to the
+    API, and imports gTTS.
+    Safe to call repeatedly; returns True once everything succeeded. The API
+    connection is best effort: if the API can't be reached, readiness isn't held
+    back and the first chat turn opens the connection instead.
+    """
+    global _ready
+    if _ready:
+        return True
+    async with _lock:
+        if _ready:
+            return True
+        started = time.perf_counter()
+        try:
+            await init_db()
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+            # Both import heavy modules (openai alone takes about a second);
+            # run them in threads so requests keep being served meanwhile
+            await asyncio.to_thread(get_client)
+            # Opening the API connection (TCP + TLS) overlaps with the gTTS import
+            await asyncio.gather(open_connection(), asyncio.to_thread(get_tts))
+        except Exception as e:
+            logger.error(f"Warm-up failed: {e}", exc_info=True)
+            return False
+        _ready = True
+        logger.info(f"Warm-up finished in {time.perf_counter() - started:.3f}s")
+        return True
+
+
+async def shutdown():
+    """
+    Releases the LLM client's and the DB engine's connection pools.
+    """
+    await close_client()
+    await engine.dispose()
@@ -0,0 +1,39 @@
+import json
+from types import SimpleNamespace
+from typing import List, Optional, Tuple
+
+
+class _Stream:
+    def __init__(self, content: str):
+        self.content = content
+
+    async def __aiter__(self):
+        delta = SimpleNamespace(content=self.content)
+        yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None)
+        yield SimpleNamespace(choices=[], usage=SimpleNamespace(prompt_tokens=10, completion_tokens=5))
+
+    async def close(self):
+        pass
+
+
+class StubClient:
+    """
+    AsyncOpenAI stand-in whose chat completions stream canned tutor replies, one
+    (currentWord, currentWordProgress) state per call, in order.
+    """
+
+    def __init__(self, states: List[Tuple[Optional[str], Optional[str]]]):
+        self._replies = iter(reply(*state) for state in states)
+        self.chat = SimpleNamespace(completions=self)
+
+    async def create(self, **kwargs):
+        return _Stream(next(self._replies))
+
+
+def reply(word: Optional[str], progress: Optional[str]) -> str:
+    return json.dumps({
+        "response": "...",
+        "currentCategory": "Food" if word else None,
+        "currentWord": word,
+        "currentWordProgress": progress,
+    })
@@ -0,0 +1,73 @@
+import asyncio
+from backend.evaluation.runner import Conversation, run_conversation
+from backend.tests.stub_llm import StubClient, reply
+
+USER_INFO = {"name": "Ana", "sourceLanguage": "English", "targetLanguage": "Spanish"}
+
+
+def run(conversation, states):
+    return asyncio.run(run_conversation(conversation, "v1", lambda info: "system", StubClient(states), "stub"))
+
+
+def test_script_counts_tokens_and_json():
+    results = run(Conversation("c", USER_INFO, script=["hi", "yes"]), [("tapas", "scenario"), ("tapas", "meaning")])
+    assert [(r.valid_json, r.tokens_in, r.tokens_out) for r in results] == [(True, 10, 5), (True, 10, 5)]
+    assert [r.illegal_transition for r in results] == [None, None]
+
+
+def test_script_flags_illegal_skip():
+    results = run(
+        Conversation("c", USER_INFO, script=["hi", "yes", "next"]),
+        [("tapas", "scenario"), ("tapas", "meaning"), ("tapas", "exerciseGenerated")],
+    )
+    assert results[1].illegal_transition is None
+    assert results[2].illegal_transition
+
+
+def test_script_allows_retry_after_generated_failure():
+    # In script mode the model's replies are the history, so its own failure starts a retry
+    results = run(
+        Conversation("c", USER_INFO, script=["a", "b", "c", "d"]),
+        [("tapas", "exerciseGenerated"), ("tapas", "exerciseFailed"), ("tapas", "meaning"), ("tapas", "exerciseGenerated")],
+    )
+    assert [r.illegal_transition for r in results] == [None, None, None, None]
+
+
+def test_replay_ignores_generated_failures():
+    messages = [
+        {"role": "system", "content": "old prompt"},
+        {"role": "user", "content": "hi"},
+        {"role": "assistant", "content": reply("tapas", "scenario")},
+        {"role": "user", "content": "yes"},
+        {"role": "assistant", "content": reply("tapas", "meaning")},
+        {"role": "user", "content": "ok"},
+        {"role": "assistant", "content": reply("tapas", "pronunciation")},
+        {"role": "user", "content": "next"},
+    ]
+    results = run(
+        Conversation("c", USER_INFO, messages=messages),
+        [("tapas", "scenario"), ("tapas", "exerciseFailed"), ("tapas", "pronunciation"), ("tapas", "exerciseGenerated")],
+    )
+    assert len(results) == 4
+    assert results[0].illegal_transition is None
+    assert results[1].illegal_transition  # scenario -> exerciseFailed
+    assert results[2].illegal_transition is None
+    # The recorded word never failed, so jumping from pronunciation to the exercise is still a skip
+    assert results[3].illegal_transition
+
+
+def test_replay_allows_retry_after_recorded_failure():
+    messages = [
+        {"role": "user", "content": "a"},
+        {"role": "assistant", "content": reply("tapas", "exerciseGenerated")},
+        {"role": "user", "content": "b"},
+        {"role": "assistant", "content": reply("tapas", "exerciseFailed")},
+        {"role": "user", "content": "c"},
+        {"role": "assistant", "content": reply("tapas", "meaning")},
+        {"role": "user", "content": "d"},
+    ]
+    results = run(
+        Conversation("c", USER_INFO, messages=messages),
+        [("tapas", "exerciseGenerated"), ("tapas", "exerciseFailed"), ("tapas", "meaning"), ("tapas", "exerciseGenerated")],
+    )
+    assert [r.illegal_transition for r in results][1:] == [None, None, None]
@@ -0,0 +1,77 @@
+import asyncio
+from backend.evaluation.runner import Conversation, run_conversation
+from backend.evaluation.transitions import transition_error
+from backend.tests.stub_llm import StubClient
+
+
+def walk(states):
+    """
+    Runs a scripted conversation whose replies go through `states` in order and
+    returns the illegal transitions the evaluation runner reports.
+    """
+    conversation = Conversation("walk", {}, script=["..."] * len(states))
+    results = asyncio.run(run_conversation(conversation, "v1", lambda info: "system", StubClient(states), "stub"))
+    return [r.illegal_transition for r in results if r.illegal_transition]
+
+
+def test_happy_path():
+    assert walk([
+        (None, None),
+        ("tapas", "initiated"),
+        ("tapas", "scenario"),
+        ("tapas", "meaning"),
+        ("tapas", "pronunciation"),
+        ("tapas", "sentence"),
+        ("tapas", "context"),
+        ("tapas", "exerciseGenerated"),
+        ("tapas", "learned"),
+        ("sofrito", "scenario"),
+    ]) == []
+
+
+def test_skip_then_new_word():
+    assert walk([
+        ("tapas", "scenario"),
+        ("tapas", "denied"),
+        (None, None),
+        ("sofrito", "initiated"),
+    ]) == []
+    assert walk([("tapas", "scenario"), ("tapas", "denied"), ("sofrito", "scenario")]) == []
+
+
+def test_fail_reteach_retry():
+    for reteach in ("meaning", "pronunciation", "sentence"):
+        assert walk([
+            ("tapas", "context"),
+            ("tapas", "exerciseGenerated"),
+            ("tapas", "exerciseFailed"),
+            ("tapas", reteach),
+            ("tapas", "exerciseGenerated"),
+            ("tapas", "learned"),
+        ]) == []
+
+
+def test_repeated_failures_then_denied():
+    assert walk([
+        ("tapas", "exerciseGenerated"),
+        ("tapas", "exerciseFailed"),
+        ("tapas", "meaning"),
+        ("tapas", "exerciseGenerated"),
+        ("tapas", "exerciseFailed"),
+        ("tapas", "sentence"),
+        ("tapas", "exerciseGenerated"),
+        ("tapas", "exerciseFailed"),
+        ("tapas", "denied"),
+        ("sofrito", "initiated"),
+    ]) == []
+
+
+def test_illegal_transitions():
+    # Jumping ahead before any failed exercise
+    assert transition_error("tapas", "meaning", "tapas", "exerciseGenerated")
+    assert transition_error("tapas", "scenario", "tapas", "learned")
+    # A new word while the current one is unfinished, or starting mid-way
+    assert transition_error("tapas", "meaning", "sofrito", "scenario")
+    assert transition_error("tapas", "learned", "sofrito", "meaning")
+    # Progress without a word
+    assert transition_error(None, None, None, "meaning")
@@ -23,7 +23,8 @@ const PronunciationPlayer: React.FC<{ sessionId: string | null; word: string }>
       const wordKey = word.toLowerCase();
       if (!playedWordsRef.current[sessionId]) playedWordsRef.current[sessionId] = new Set();
       const sessionWords = playedWordsRef.current[sessionId];
-      const url = `${backendBase}/speech/${wordKey}`;
+      // session_id lets the backend speak the learner's target language
+      const url = `${backendBase}/speech/${encodeURIComponent(wordKey)}?session_id=${encodeURIComponent(sessionId)}`;
       setAudioUrl(url);
       if (!sessionWords.has(wordKey)) {
         sessionWords.add(wordKey);